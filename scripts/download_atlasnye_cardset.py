@@ -1,105 +1,163 @@
 import os
-import urllib.request
+import json
+import ssl
+import urllib.error
 import urllib.parse
+import urllib.request
 import re
+import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
-CATEGORY_URL = "https://commons.wikimedia.org/wiki/Category:SVG_Atlasnye_playing_cards"
+API_URL = "https://commons.wikimedia.org/w/api.php"
+CATEGORY = "Category:SVG_Atlasnye_playing_cards"
 OUTPUT_DIR = "atlasnye"
 
 # --- Mapping Rules ---
-# We map keywords found in filenames to the single-letter codes
-SUITS_REGEX = {
-    'H': r'(heart|chervi|worm)',    # English, Russian (Chervi), slang
-    'D': r'(diamond|bubn)',         # English, Russian (Bubny)
-    'C': r'(club|tref)',            # English, Russian (Trefy)
-    'S': r'(spade|pik)'             # English, Russian (Piki)
+# We map keywords found in filenames to the single-letter codes.
+# Suit and rank keywords share one pattern so each name is scanned once;
+# the group name is the suit code, or "rank" for any rank keyword.
+CARD_KEYWORDS_REGEX = re.compile(
+    r'(?P<rank>ace|tuz|10|1\b|king|korol|queen|dama|jack|knave|valet|[2-9])'  # 1 is sometimes Ace in filenames
+    r'|(?P<H>heart|chervi|worm)'    # English, Russian (Chervi), slang
+    r'|(?P<D>diamond|bubn)'         # English, Russian (Bubny)
+    r'|(?P<C>club|tref)'            # English, Russian (Trefy)
+    r'|(?P<S>spade|pik)'            # English, Russian (Piki)
+)
+
+RANK_KEYWORDS = {
+    'ace': 'A', 'tuz': 'A', '1': 'A',
+    'king': 'K', 'korol': 'K',
+    'queen': 'Q', 'dama': 'Q',
+    'jack': 'J', 'knave': 'J', 'valet': 'J',
+    '10': 'T', '9': '9', '8': '8', '7': '7', '6': '6', '5': '5', '4': '4', '3': '3', '2': '2'
 }
 
-RANKS_REGEX = {
-    'A': r'(ace|tuz|1\b)',          # 1 is sometimes Ace in filenames
-    'K': r'(king|korol)',
-    'Q': r'(queen|dama)',
-    'J': r'(jack|knave|valet)',
-    'T': r'(10)',
-    '9': r'(9)',
-    '8': r'(8)',
-    '7': r'(7)',
-    '6': r'(6)',
-    '5': r'(5)',
-    '4': r'(4)',
-    '3': r'(3)',
-    '2': r'(2)'
-}
+# When a name contains several keywords, the first code in these orders wins
+# (aces and court cards before numbers), regardless of where they appear.
+SUIT_PRIORITY = 'HDCS'
+RANK_PRIORITY = 'AKQJT98765432'
+
+# parse_filename returns these for backs and colourless jokers; assign_targets
+# then numbers them in file order. Only the first MAX_BACKS backs are kept.
+BACK = "B"
+JOKER = "J"
+MAX_BACKS = 2
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
+RETRIES = 3
+MAX_WORKERS = 8
+COPY_CHUNK_SIZE = 64 * 1024  # stream downloads to disk in chunks
 
-# Counters to handle the "2 backs" request
-back_counter = 0
-joker_counter = 0
+# One TLS context and opener shared by every request; urllib follows redirects
+SSL_CONTEXT = ssl.create_default_context()
+OPENER = urllib.request.build_opener(urllib.request.HTTPSHandler(context=SSL_CONTEXT))
 
 def safe_urlopen(url_or_req):
     url = url_or_req.get_full_url() if isinstance(url_or_req, urllib.request.Request) else url_or_req
-    parsed = urllib.parse.urlparse(url)
-    if parsed.scheme not in ('http', 'https'):
-        raise ValueError(f"Insecure URL scheme: {parsed.scheme}")
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError(f"Insecure URL scheme: {url.split(':', 1)[0]}")
     # nosemgrep: python.lang.security.audit.dynamic-urllib-use-detected.dynamic-urllib-use-detected
-    return urllib.request.urlopen(url_or_req)
-
-def get_html(url):
-    req = urllib.request.Request(
-        url, 
-        headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
-    )
-    with safe_urlopen(req) as response:
-        return response.read().decode('utf-8')
-
-def download_file(file_page_part, output_name):
+    return OPENER.open(url_or_req, timeout=30)
+
+def http_get(url):
+    """GETs a URL and returns the response, retrying when rate limited."""
+    req = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    for attempt in range(RETRIES):
+        try:
+            return safe_urlopen(req)
+        except urllib.error.HTTPError as e:
+            if e.code != 429 or attempt == RETRIES - 1:
+                raise
+            # Rate limited: back off here instead of pacing every request.
+            retry_after = e.headers.get('Retry-After', '')
+            time.sleep(int(retry_after) if retry_after.isdigit() else 1)
+
+def get_json(url):
+    with http_get(url) as response:
+        return json.load(response)
+
+def list_category_files(category):
     """
-    Takes a partial URL (e.g., /wiki/File:Name.svg), finds the upload link, and downloads.
+    Returns {filename: upload_url} for every file in a Commons category.
+    One API query (per 500 members) lists the files together with their
+    direct upload URLs, so no category or file pages need scraping.
+    """
+    params = {
+        'action': 'query',
+        'format': 'json',
+        'generator': 'categorymembers',
+        'gcmtitle': category,
+        'gcmtype': 'file',
+        'gcmlimit': 'max',
+        'prop': 'imageinfo',
+        'iiprop': 'url',
+    }
+    files = {}
+    while True:
+        data = get_json(f"{API_URL}?{urllib.parse.urlencode(params)}")
+        for page in data.get('query', {}).get('pages', {}).values():
+            # Pages can repeat across continuation batches, with imageinfo in only one
+            if page.get('imageinfo'):
+                filename = page['title'].split(':', 1)[1]
+                files[filename] = page['imageinfo'][0]['url']
+        if 'continue' not in data:
+            return files
+        params.update(data['continue'])
+
+def link_name(title):
+    """A file title as it appears in a /wiki/File: link (underscored, percent-encoded)."""
+    # Same safe characters as MediaWiki's wfUrlencode
+    return urllib.parse.quote(title.replace(' ', '_'), safe=";@$!*(),/~:")
+
+def download_file(upload_url, output_name):
+    """
+    Downloads a direct upload URL (e.g., https://upload.wikimedia.org/.../Name.svg).
     """
-    full_page_url = f"https://commons.wikimedia.org{file_page_part}"
-    print(f"Processing {output_name}...", end=" ")
-    
     try:
-        html = get_html(full_page_url)
-        # Find the real upload URL
-        match = re.search(r'href="(https://upload\.wikimedia\.org/wikipedia/commons/[^"]+\.svg)"', html)
+        output_path = os.path.join(OUTPUT_DIR, output_name)
         
-        if match:
-            raw_url = match.group(1)
-            output_path = os.path.join(OUTPUT_DIR, output_name)
-            
-            # Download
-            req = urllib.request.Request(raw_url, headers={'User-Agent': 'Mozilla/5.0'})
-            with safe_urlopen(req) as response:
-                with open(output_path, 'wb') as f:
-                    f.write(response.read())
-            print("OK")
-            return True
-        else:
-            print("Skipped (No SVG source link found)")
-            return False
+        # Stream into a temp file and only move it into place once complete, so
+        # a dropped connection never leaves a truncated card behind.
+        tmp_path = f"{output_path}.tmp"
+        try:
+            with http_get(upload_url) as response:
+                with open(tmp_path, 'wb') as f:
+                    shutil.copyfileobj(response, f, COPY_CHUNK_SIZE)
+                    # read(n) reports a cut-off body as a plain EOF, so check the length
+                    expected = response.headers.get('Content-Length')
+                    if expected is not None and f.tell() != int(expected):
+                        raise OSError(f"incomplete download ({f.tell()} of {expected} bytes)")
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        print(f"{output_name}: OK")
+        return True
     except Exception as e:
-        print(f"Error: {e}")
+        print(f"{output_name}: Error: {e}")
         return False
 
+def download_first(output_name, upload_urls):
+    """Downloads the first candidate URL that succeeds for output_name."""
+    return any(download_file(url, output_name) for url in upload_urls)
+
 def parse_filename(filename):
     """
     Analyzes the filename to determine the target name (e.g., KH.svg).
-    Returns (TargetFilename, Priority). Priority helps filter 'generic' vs 'specific' files.
+    Returns BACK/JOKER for cards that assign_targets numbers, or None.
     """
-    global back_counter, joker_counter
-    
     name = filename.lower()
-    name = urllib.parse.unquote(name) # Convert %20 to space
+    # Only SVGs can become cards: reject anything else before decoding or scanning
+    if not name.endswith('.svg'):
+        return None
+    name = urllib.parse.unquote(name[:-4]) # Convert %20 to space
 
     # 1. Check for Backs
     # "rubashka" is Russian for "shirt/back" often used in these filenames
     if "back" in name or "rubashka" in name or "dorso" in name:
-        if back_counter < 2:
-            back_counter += 1
-            return f"{back_counter}B.svg"
-        return None # Ignore extra backs
+        return BACK
 
     # 2. Check for Jokers
     if "joker" in name or "jolly" in name:
@@ -109,77 +167,72 @@ def parse_filename(filename):
             return "2J.svg"
         
         # Fallback to sequential if no color in name
-        joker_counter += 1
-        return f"{joker_counter}J.svg"
-
-    # 3. Detect Suit
-    found_suit = None
-    for code, pattern in SUITS_REGEX.items():
-        if re.search(pattern, name):
-            found_suit = code
-            break
-    
-    # 4. Detect Rank
-    found_rank = None
-    for code, pattern in RANKS_REGEX.items():
-        # strict boundary check \b is implied by the regex list above mostly, 
-        # but we need to ensure "10" matches 10 but not "100".
-        # We search for the number surrounded by non-digits
-        if code in ['T', '9', '8', '7', '6', '5', '4', '3', '2']:
-            # Search for the specific number (e.g., '10') not part of another number
-            # Using simple check: is the number in the string?
-            if re.search(pattern, name):
-                found_rank = code
-                break
+        return JOKER
+
+    # 3. Detect Suit and Rank
+    suits, ranks = set(), set()
+    for match in CARD_KEYWORDS_REGEX.finditer(name):
+        if match.lastgroup == 'rank':
+            ranks.add(RANK_KEYWORDS[match.group()])
         else:
-            # Words (King, Queen)
-            if re.search(pattern, name):
-                found_rank = code
-                break
+            suits.add(match.lastgroup)
+
+    found_suit = next((code for code in SUIT_PRIORITY if code in suits), None)
+    found_rank = next((code for code in RANK_PRIORITY if code in ranks), None)
 
     if found_suit and found_rank:
         return f"{found_rank}{found_suit}.svg"
 
     return None
 
+def assign_targets(filenames):
+    """
+    Maps each recognised filename to its target name, numbering backs and
+    colourless jokers in the order given. Extra backs are ignored.
+    """
+    targets = {}
+    backs = jokers = 0
+
+    for filename in filenames:
+        target_name = parse_filename(filename)
+        if target_name == BACK:
+            if backs == MAX_BACKS:
+                continue # Ignore extra backs
+            backs += 1
+            target_name = f"{backs}{BACK}.svg"
+        elif target_name == JOKER:
+            jokers += 1
+            target_name = f"{jokers}{JOKER}.svg"
+
+        if target_name:
+            targets[filename] = target_name
+
+    return targets
+
 def main():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
-    print(f"Scanning category: {CATEGORY_URL}")
-    html = get_html(CATEGORY_URL)
-
-    # Find all file links
-    # Pattern: href="/wiki/File:Something.svg"
-    file_links = re.findall(r'href="(/wiki/File:[^"]+\.svg)"', html)
+    print(f"Querying category: {CATEGORY}")
+    files = list_category_files(CATEGORY)
     
-    # Deduplicate
-    file_links = sorted(list(set(file_links)))
-    
-    print(f"Found {len(file_links)} potential SVG files.")
+    print(f"Found {len(files)} files.")
 
-    processed_files = set()
+    # Group candidates per target so a failed download falls back to the next
+    # file that maps to the same card (e.g. if the category lists multiple versions).
+    candidates = {}
 
-    for link in file_links:
-        # Extract just the filename part for parsing
-        # link looks like "/wiki/File:Atlas_deck_King_of_Hearts.svg"
-        filename = link.split("File:")[-1]
-        
-        target_name = parse_filename(filename)
-        
-        if target_name:
-            if target_name in processed_files:
-                continue # Skip duplicate detections (e.g. if category lists multiple versions)
-            
-            success = download_file(link, target_name)
-            if success:
-                processed_files.add(target_name)
-                # Polite delay
-                time.sleep(0.3)
-        else:
-            # Uncomment to debug why a file was skipped
-            # print(f"Ignored: {filename}")
-            pass
+    # Parse names in their page-link form, e.g. "Atlas_deck_King_of_Hearts.svg", and
+    # in the order the category page's links sorted in: backs and colourless jokers
+    # are numbered in this order (" " sorts before "." and digits, "_" after).
+    upload_urls = dict(sorted((link_name(title), url) for title, url in files.items()))
+
+    for filename, target_name in assign_targets(upload_urls).items():
+        candidates.setdefault(target_name, []).append(upload_urls[filename])
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = executor.map(download_first, candidates.keys(), candidates.values())
+        processed_files = [name for name, ok in zip(candidates, results) if ok]
 
     print("\n------------------------------------------------")
     print(f"Download Complete. Files saved to '{OUTPUT_DIR}'")
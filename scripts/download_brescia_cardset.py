@@ -1,11 +1,19 @@
 import os
+import json
+import ssl
+import urllib.error
+import urllib.parse
 import urllib.request
 import re
+import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
 from html.parser import HTMLParser
 
 # --- Configuration ---
 CATEGORY_URL = "https://commons.wikimedia.org/wiki/Category:Brescia_deck"
+API_URL = "https://commons.wikimedia.org/w/api.php"
+API_TITLES_LIMIT = 50  # max titles per query for regular API users
 OUTPUT_DIR = "brescia"
 
 # --- Mappings ---
@@ -26,47 +34,104 @@ COLUMN_RANK_MAP = [
     'A', 'K', 'Q', 'J', 'T', '9', '8', '7', '6', '5', '4', '3', '2'
 ]
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
+RETRIES = 3
+MAX_WORKERS = 8
+COPY_CHUNK_SIZE = 64 * 1024  # stream downloads to disk in chunks
+
+# One TLS context and opener shared by every request; urllib follows redirects
+SSL_CONTEXT = ssl.create_default_context()
+OPENER = urllib.request.build_opener(urllib.request.HTTPSHandler(context=SSL_CONTEXT))
+
 def safe_urlopen(url_or_req):
     url = url_or_req.get_full_url() if isinstance(url_or_req, urllib.request.Request) else url_or_req
-    parsed = urllib.parse.urlparse(url)
-    if parsed.scheme not in ('http', 'https'):
-        raise ValueError(f"Insecure URL scheme: {parsed.scheme}")
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError(f"Insecure URL scheme: {url.split(':', 1)[0]}")
     # nosemgrep: python.lang.security.audit.dynamic-urllib-use-detected.dynamic-urllib-use-detected
-    return urllib.request.urlopen(url_or_req)
+    return OPENER.open(url_or_req, timeout=30)
+
+def http_get(url):
+    """GETs a URL and returns the response, retrying when rate limited."""
+    req = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    for attempt in range(RETRIES):
+        try:
+            return safe_urlopen(req)
+        except urllib.error.HTTPError as e:
+            if e.code != 429 or attempt == RETRIES - 1:
+                raise
+            # Rate limited: back off here instead of pacing every request.
+            retry_after = e.headers.get('Retry-After', '')
+            time.sleep(int(retry_after) if retry_after.isdigit() else 1)
 
 def get_html(url):
-    req = urllib.request.Request(
-        url, 
-        headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
-    )
-    with safe_urlopen(req) as response:
+    with http_get(url) as response:
         return response.read().decode('utf-8')
 
-def download_file(file_page_url, output_name):
-    print(f"Fetching info for {output_name}...")
+def get_json(url):
+    with http_get(url) as response:
+        return json.load(response)
+
+def resolve_upload_urls(file_page_urls):
+    """
+    Maps /wiki/File:... links to their direct upload URLs with batched
+    imageinfo queries, instead of fetching every file page.
+    """
+    titles = {urllib.parse.unquote(link.split('/wiki/', 1)[1]): link for link in file_page_urls}
+    batch_titles = list(titles)
+    upload_urls = {}
+
+    for start in range(0, len(batch_titles), API_TITLES_LIMIT):
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'prop': 'imageinfo',
+            'iiprop': 'url',
+            'titles': '|'.join(batch_titles[start:start + API_TITLES_LIMIT]),
+        }
+        query = get_json(f"{API_URL}?{urllib.parse.urlencode(params)}").get('query', {})
+        # The API reports titles normalised (underscores -> spaces); map them back
+        requested = {n['to']: n['from'] for n in query.get('normalized', [])}
+        for page in query.get('pages', {}).values():
+            if page.get('imageinfo'):
+                title = requested.get(page['title'], page['title'])
+                upload_urls[titles[title]] = page['imageinfo'][0]['url']
+
+    return upload_urls
+
+def download_file(image_url, output_name):
+    if not image_url:
+        print(f" -> Could not find download link for {output_name}")
+        return False
     try:
-        full_url = f"https://commons.wikimedia.org{file_page_url}"
-        html = get_html(full_url)
-        
-        match = re.search(r'href="(https://upload\.wikimedia\.org/wikipedia/commons/[^"]+\.svg)"', html)
+        output_path = os.path.join(OUTPUT_DIR, output_name)
         
-        if match:
-            image_url = match.group(1)
-            output_path = os.path.join(OUTPUT_DIR, output_name)
-            
-            req = urllib.request.Request(image_url, headers={'User-Agent': 'Mozilla/5.0'})
-            with safe_urlopen(req) as response:
-                with open(output_path, 'wb') as f:
-                    f.write(response.read())
-            print(f" -> Saved {output_name}")
-            return True
-        else:
-            print(f" -> Could not find download link for {output_name}")
-            return False
+        # Stream into a temp file and only move it into place once complete, so
+        # a dropped connection never leaves a truncated card behind.
+        tmp_path = f"{output_path}.tmp"
+        try:
+            with http_get(image_url) as response:
+                with open(tmp_path, 'wb') as f:
+                    shutil.copyfileobj(response, f, COPY_CHUNK_SIZE)
+                    # read(n) reports a cut-off body as a plain EOF, so check the length
+                    expected = response.headers.get('Content-Length')
+                    if expected is not None and f.tell() != int(expected):
+                        raise OSError(f"incomplete download ({f.tell()} of {expected} bytes)")
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        print(f" -> Saved {output_name}")
+        return True
     except Exception as e:
         print(f" -> Error: {e}")
         return False
 
+BACK_LINK_RE = re.compile(r'href="(/wiki/File:[^"]*?(?:Dorso|Back)[^"]*?\.svg)"', re.IGNORECASE)
+JOKER_LINK_RE = re.compile(r'href="(/wiki/File:[^"]*?(?:Jolly|Joker)[^"]*?\.svg)"', re.IGNORECASE)
+
+# Lower-cased once for the case-insensitive suit check in handle_data
+SUIT_KEYWORDS = [(key.lower(), code) for key, code in SUIT_MAP.items()]
+
 class DeckTableParser(HTMLParser):
     def __init__(self):
         super().__init__()
@@ -78,52 +143,52 @@ class DeckTableParser(HTMLParser):
         self.cards_found = {}
 
     def handle_starttag(self, tag, attrs):
-        attrs = dict(attrs)
-        
+        # Only <table> and <a> need their attributes; skip the dict for the rest.
         if tag == 'table':
-            if 'wikitable' in attrs.get('class', ''):
+            if 'wikitable' in (dict(attrs).get('class') or ''):
                 self.in_table = True
-        
-        if self.in_table and tag == 'tr':
+            return
+
+        if not self.in_table:
+            return
+
+        if tag == 'tr':
             self.in_row = True
             self.col_index = -1 
             self.current_suit = None 
-            
-        if self.in_row and (tag == 'td' or tag == 'th'):
+        elif self.in_row and (tag == 'td' or tag == 'th'):
             self.in_cell = True
             if tag == 'td':
                 self.col_index += 1
-
-        if self.in_cell and tag == 'a':
-            href = attrs.get('href')
-            if href and 'File:' in href and href.endswith('.svg'):
-                if self.current_suit and 0 <= self.col_index < len(COLUMN_RANK_MAP):
+        elif self.in_cell and tag == 'a':
+            if self.current_suit and 0 <= self.col_index < len(COLUMN_RANK_MAP):
+                href = dict(attrs).get('href')
+                if href and 'File:' in href and href.endswith('.svg'):
                     rank = COLUMN_RANK_MAP[self.col_index]
                     filename = f"{rank}{self.current_suit}.svg"
                     self.cards_found[filename] = href
 
     def handle_endtag(self, tag):
         if tag == 'table': self.in_table = False
-        if tag == 'tr': self.in_row = False
-        if tag == 'td' or tag == 'th': self.in_cell = False
+        elif tag == 'tr': self.in_row = False
+        elif tag == 'td' or tag == 'th': self.in_cell = False
 
     def handle_data(self, data):
         if self.in_cell:
-            text = data.strip()
+            text = data.strip().lower()
             if not text: return
             
-            # Case-insensitive check
-            for key, code in SUIT_MAP.items():
-                if key.lower() in text.lower():
+            for key, code in SUIT_KEYWORDS:
+                if key in text:
                     self.current_suit = code
 
 def find_extras(html):
     extras = {}
-    back_match = re.search(r'href="(/wiki/File:[^"]*?(?:Dorso|Back)[^"]*?\.svg)"', html, re.IGNORECASE)
+    back_match = BACK_LINK_RE.search(html)
     if back_match:
         extras['1B.svg'] = back_match.group(1)
         
-    jokers = set(re.findall(r'href="(/wiki/File:[^"]*?(?:Jolly|Joker)[^"]*?\.svg)"', html, re.IGNORECASE))
+    jokers = set(JOKER_LINK_RE.findall(html))
     jokers = sorted(list(jokers))
     if len(jokers) > 0: extras['1J.svg'] = jokers[0]
     if len(jokers) > 1: extras['2J.svg'] = jokers[1]
@@ -145,9 +210,12 @@ def main():
     extras = find_extras(html_content)
     all_cards = {**cards, **extras}
 
-    for filename, page_url in all_cards.items():
-        download_file(page_url, filename)
-        time.sleep(0.5)
+    print("Resolving download links...")
+    upload_urls = resolve_upload_urls(all_cards.values())
+    image_urls = [upload_urls.get(page_url) for page_url in all_cards.values()]
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(download_file, image_urls, all_cards.keys()))
 
     print(f"\nDone! Check '{OUTPUT_DIR}'.")
 
@@ -1,12 +1,24 @@
 import os
+import hashlib
+import json
+import ssl
+import time
+import urllib.error
 import urllib.request
 import xml.etree.ElementTree as ET
 import copy
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 BASE_URL = "https://raw.githubusercontent.com/digitaldesignlabs/responsive-playing-cards/main/minified/"
 OUTPUT_DIR = "digitaldesignlabs"
 
+# Records which source (and which version of this script) each card was built from,
+# so unchanged cards are skipped on re-runs. Kept next to the script rather than in
+# OUTPUT_DIR, which is a served asset folder; entries are keyed by output directory.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+SOURCE_HASHES_FILE = os.path.join(CACHE_DIR, "digitaldesignlabs-source-hashes.json")
+
 # Size Mapping: Identifier (id or class) -> Output Folder Name
 SIZES = {
     # ID-based (Standard DDL format)
@@ -26,6 +38,11 @@ NS = {'svg': 'http://www.w3.org/2000/svg', 'xlink': 'http://www.w3.org/1999/xlin
 ET.register_namespace("", "http://www.w3.org/2000/svg")
 ET.register_namespace("xlink", "http://www.w3.org/1999/xlink")
 
+# Qualified tag names as ElementTree reports them, compared directly
+G_TAG = f"{{{NS['svg']}}}g"
+DEFS_TAG = f"{{{NS['svg']}}}defs"
+STYLE_TAG = f"{{{NS['svg']}}}style"
+
 # --- Mappings ---
 SUIT_MAP = {'s': 'spades', 'h': 'hearts', 'd': 'diamonds', 'c': 'clubs'}
 RANKS = {
@@ -36,35 +53,60 @@ RANKS = {
 # Skipping specials as they are missing in the source
 SPECIALS = {}
 
-def get_target_filename(suit_char, rank_id):
-    if suit_char in SUIT_MAP and rank_id in RANKS:
-        return f"{RANKS[rank_id]}{suit_char.upper()}.svg"
-    return None
+# (source folder, source filename, target filename) for every card, e.g.
+# ("hearts", "10h.svg", "TH.svg")
+CARDS = [
+    (folder_name, f"{rank_id}{suit_char}.svg", f"{rank}{suit_char.upper()}.svg")
+    for suit_char, folder_name in SUIT_MAP.items()
+    for rank_id, rank in RANKS.items()
+]
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
+RETRIES = 3
+MAX_WORKERS = 8
 
-def safe_urlopen(url):
-    parsed = urllib.parse.urlparse(url)
-    if parsed.scheme not in ('http', 'https'):
-        raise ValueError(f"Insecure URL scheme: {parsed.scheme}")
+# One TLS context and opener shared by every request; urllib follows redirects
+SSL_CONTEXT = ssl.create_default_context()
+OPENER = urllib.request.build_opener(urllib.request.HTTPSHandler(context=SSL_CONTEXT))
+
+def safe_urlopen(url_or_req):
+    url = url_or_req.get_full_url() if isinstance(url_or_req, urllib.request.Request) else url_or_req
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError(f"Insecure URL scheme: {url.split(':', 1)[0]}")
     # nosemgrep: python.lang.security.audit.dynamic-urllib-use-detected.dynamic-urllib-use-detected
-    return urllib.request.urlopen(url)
+    return OPENER.open(url_or_req, timeout=30)
+
+def http_get(url):
+    """GETs a URL and returns the response, retrying when rate limited."""
+    req = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    for attempt in range(RETRIES):
+        try:
+            return safe_urlopen(req)
+        except urllib.error.HTTPError as e:
+            if e.code != 429 or attempt == RETRIES - 1:
+                raise
+            # Rate limited: back off here instead of pacing every request.
+            retry_after = e.headers.get('Retry-After', '')
+            time.sleep(int(retry_after) if retry_after.isdigit() else 1)
 
 def download_svg_text(url):
     try:
-        with safe_urlopen(url) as response:
+        with http_get(url) as response:
             return response.read().decode('utf-8')
     except Exception as e:
         print(f"Failed to download {url}: {e}")
         return None
 
 def process_and_save(svg_text, target_filename):
+    """Writes every size variant found in svg_text; returns the subfolders written."""
     try:
         root = ET.fromstring(svg_text)
     except ET.ParseError as e:
         print(f"XML Error: {e}")
-        return
+        return []
 
     viewBox = root.get('viewBox')
-    if not viewBox: return
+    if not viewBox: return []
     _, _, width, height = map(float, viewBox.split())
     
     radius = round(width * 0.05, 2)
@@ -74,45 +116,41 @@ def process_and_save(svg_text, target_filename):
     available_groups = {}
     
     # Find groups by ID or Class
-    for child in root.iter():
-        if child.tag.endswith('g'):
-            # Check ID
-            gid = child.get('id')
-            if gid in SIZES:
-                available_groups[gid] = child
-                continue
-            
-            # Check Class
-            cls = child.get('class')
-            if cls in SIZES:
-                available_groups[cls] = child
+    for child in root.iter(G_TAG):
+        # Check ID
+        gid = child.get('id')
+        if gid in SIZES:
+            available_groups[gid] = child
+            continue
+        
+        # Check Class
+        cls = child.get('class')
+        if cls in SIZES:
+            available_groups[cls] = child
 
     # If no recognized groups found, save root to 'xl' as fallback
     if not available_groups:
         save_variant(root, "xl", target_filename, width, height, radius, stroke_width)
-        return
+        return ["xl"]
+
+    # Defs (needed for <use>) are copied and cleaned of <style> once, then shared
+    # by every variant: media queries would otherwise hide the extracted group.
+    defs = root.find(DEFS_TAG)
+    if defs is not None:
+        defs = copy.deepcopy(defs)
+        for parent in defs.iter():
+            for child in list(parent):
+                if child.tag == STYLE_TAG:
+                    parent.remove(child)
 
     # Process found variants
     for identifier, group_node in available_groups.items():
         subfolder = SIZES[identifier]
         
-        # Create clean root
-        new_root = copy.deepcopy(root)
-        new_root.clear() # Remove all children
-        new_root.attrib = root.attrib # Keep attributes
-        
-        # Copy Defs (needed for <use>)
-        for child in root:
-            if child.tag.endswith('defs'):
-                new_root.append(copy.deepcopy(child))
-                break
-        
-        # 1. Clean style tags recursively from the entire new tree (including defs)
-        #    This ensures media queries don't hide our extracted group.
-        for parent in new_root.iter():
-            for child in list(parent):
-                if child.tag.endswith('style'):
-                    parent.remove(child)
+        # 1. Create clean root (same attributes) holding the shared defs
+        new_root = ET.Element(root.tag, root.attrib)
+        if defs is not None:
+            new_root.append(defs)
 
         # 2. Add the specific group
         variant_group = copy.deepcopy(group_node)
@@ -126,6 +164,8 @@ def process_and_save(svg_text, target_filename):
         # 3. Save
         save_variant(new_root, subfolder, target_filename, width, height, radius, stroke_width)
 
+    return [SIZES[identifier] for identifier in available_groups]
+
 def save_variant(root_node, subfolder, filename, w, h, r, s_width):
     # Add Background (White fill) with same rounded corners as border
     background = ET.Element('rect', {
@@ -155,28 +195,95 @@ def save_variant(root_node, subfolder, filename, w, h, r, s_width):
     if not os.path.exists(target_dir): os.makedirs(target_dir)
     
     output_path = os.path.join(target_dir, filename)
-    tree = ET.ElementTree(root_node)
-    tree.write(output_path, encoding='utf-8', xml_declaration=False)
+    data = ET.tostring(root_node, encoding='utf-8', xml_declaration=False)
+    write_if_changed(output_path, data)
+
+def write_if_changed(path, data):
+    """
+    Writes data with a single write to a temp file that then replaces path, so
+    the SVG is never seen half-written. Leaves path alone if it already holds data.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+def load_source_hashes():
+    """Returns the whole manifest; each output directory has its own section."""
+    try:
+        with open(SOURCE_HASHES_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_source_hashes(manifest):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{SOURCE_HASHES_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, SOURCE_HASHES_FILE)
+
+def source_digest(svg_text):
+    # BLAKE2b is faster than SHA-1 here and a 128-bit digest is plenty for a cache key
+    return hashlib.blake2b(svg_text.encode('utf-8'), digest_size=16).hexdigest()
+
+def script_digest():
+    """Versions the transform: any edit to this script rebuilds every card."""
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+def is_up_to_date(entry, digest, script, target_filename):
+    """
+    True if the card was last built from this exact source by this exact script,
+    and its outputs still exist.
+    """
+    return (
+        entry is not None
+        and entry.get("blake2b") == digest
+        and entry.get("script") == script
+        and all(os.path.exists(os.path.join(OUTPUT_DIR, sub, target_filename)) for sub in entry["outputs"])
+    )
 
 def main():
     if not os.path.exists(OUTPUT_DIR): os.makedirs(OUTPUT_DIR)
     print("Processing DigitalDesignLabs...")
 
-    ddl_ranks = [str(i) for i in range(1, 11)] + ['j', 'q', 'k']
-    
-    for suit_char, folder_name in SUIT_MAP.items():
-        for rank_id in ddl_ranks:
-            src = f"{rank_id}{suit_char}.svg"
-            url = f"{BASE_URL}{folder_name}/{src}"
-            tgt = get_target_filename(suit_char, rank_id)
-            
-            print(f"DL: {folder_name}/{src} -> {tgt}...", end="", flush=True)
-            txt = download_svg_text(url)
-            if txt:
-                process_and_save(txt, tgt)
-                print(" OK")
-            else:
-                print(" Fail")
+    manifest = load_source_hashes()
+    source_hashes = manifest.setdefault(os.path.abspath(OUTPUT_DIR), {})
+    script = script_digest()
+
+    # Fetch concurrently; parse and write on the main thread as results arrive in order.
+    urls = [f"{BASE_URL}{folder_name}/{src}" for folder_name, src, _ in CARDS]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for (folder_name, src, tgt), txt in zip(CARDS, executor.map(download_svg_text, urls)):
+            if not txt:
+                print(f"DL: {folder_name}/{src} -> {tgt} Fail")
+                continue
+
+            digest = source_digest(txt)
+            if is_up_to_date(source_hashes.get(tgt), digest, script, tgt):
+                print(f"DL: {folder_name}/{src} -> {tgt} Unchanged")
+                continue
+
+            outputs = process_and_save(txt, tgt)
+            if not outputs:
+                # Nothing was written (parse error, no viewBox): never mark it up to date
+                source_hashes.pop(tgt, None)
+                print(f"DL: {folder_name}/{src} -> {tgt} Fail")
+                continue
+
+            source_hashes[tgt] = {"blake2b": digest, "script": script, "outputs": outputs}
+            print(f"DL: {folder_name}/{src} -> {tgt} OK")
+
+    save_source_hashes(manifest)
 
     print("\nExtraction complete.")
 
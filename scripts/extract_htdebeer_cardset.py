@@ -1,21 +1,27 @@
 """
 Extract individual playing-card SVGs by isolating the desired <g id="...">.
 
-This keeps shared <defs> and styles so symbols referenced via <use> remain intact,
-avoiding the blank exports seen when using inkscape --export-id.
+This keeps the <defs> entries and styles the card references so symbols used via
+<use> remain intact, avoiding the blank exports seen when using inkscape --export-id.
 """
-import copy
+import re
+import shutil
 import sys
 import urllib.request
-import urllib.parse
 import xml.etree.ElementTree as ET
 from pathlib import Path
+from typing import NamedTuple
 
 # --- Configuration ---
 URL = "https://raw.githubusercontent.com/htdebeer/SVG-cards/master/svg-cards.svg"
 BASE_DIR = Path.cwd()
 INPUT_FILE = BASE_DIR / "svg-cards.svg"
 OUTPUT_DIR = BASE_DIR / "htdebeer"
+COPY_CHUNK_SIZE = 64 * 1024  # stream the download to disk in chunks
+SVG_NS = "http://www.w3.org/2000/svg"
+
+# Matches url(#id) references in presentation attributes and style text
+URL_REF_RE = re.compile(r"url\(\s*#([^)\s]+)\s*\)")
 
 # Mapping Desired Filename -> Internal SVG ID
 # The repo uses specific IDs: {suit}_{rank} (e.g. club_1, heart_queen)
@@ -48,10 +54,16 @@ SPECIALS = {
     "2J": "joker_black",  # Black Joker
 }
 
+# Output filename -> internal SVG ID for every card (standard cards, then specials)
+TARGETS: dict[str, str] = {
+    f"{rank_out}{suit_out}.svg": f"{suit_in}_{rank_in}"
+    for rank_out, rank_in in RANKS.items()
+    for suit_out, suit_in in SUITS.items()
+} | {f"{filename}.svg": card_id for filename, card_id in SPECIALS.items()}
+
 def safe_urlopen(url):
-    parsed = urllib.parse.urlparse(url)
-    if parsed.scheme not in ('http', 'https'):
-        raise ValueError(f"Insecure URL scheme: {parsed.scheme}")
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError(f"Insecure URL scheme: {url.split(':', 1)[0]}")
     # nosemgrep: python.lang.security.audit.dynamic-urllib-use-detected.dynamic-urllib-use-detected
     return urllib.request.urlopen(url)
 
@@ -68,7 +80,7 @@ def main() -> None:
         try:
             with safe_urlopen(URL) as response:
                 with open(INPUT_FILE, 'wb') as f:
-                    f.write(response.read())
+                    shutil.copyfileobj(response, f, COPY_CHUNK_SIZE)
         except Exception as exc:  # pragma: no cover - CLI helper
             print(f"Error downloading: {exc}")
             return
@@ -87,66 +99,117 @@ def main() -> None:
     tree = ET.parse(INPUT_FILE)
     root = tree.getroot()
 
-    # 4. Generate Target List
-    targets: dict[str, str] = {}
-
-    # Standard Cards
-    for rank_out, rank_in in RANKS.items():
-        for suit_out, suit_in in SUITS.items():
-            filename = f"{rank_out}{suit_out}.svg"
-            card_id = f"{suit_in}_{rank_in}"
-            targets[filename] = card_id
+    defs = root.find(f"{{{SVG_NS}}}defs")
+    if defs is None:
+        print("  [ERROR] No <defs> section found in SVG.")
+        return
 
-    # Special Cards
-    for filename, card_id in SPECIALS.items():
-        targets[f"{filename}.svg"] = card_id
+    index = index_defs(defs)
 
-    print(f"Extracting {len(targets)} cards to '{OUTPUT_DIR}'...")
+    print(f"Extracting {len(TARGETS)} cards to '{OUTPUT_DIR}'...")
 
-    # 5. Process each card
-    for filename, target_id in targets.items():
-        save_isolated_card(root, filename, target_id)
+    # 4. Process each card
+    for filename, target_id in TARGETS.items():
+        save_isolated_card(root, index, filename, target_id)
 
     print("\nDone!")
 
 
-def save_isolated_card(original_root: ET.Element, filename: str, target_id: str) -> None:
+class DefsIndex(NamedTuple):
+    """Lookups over the source <defs>, built once and shared by every card."""
+
+    defs: ET.Element
+    # id -> element anywhere inside <defs> (cards live there in this source SVG)
+    elements: dict[str, ET.Element]
+    # id -> top-level <defs> child containing that id
+    owners: dict[str, ET.Element]
+    # top-level <defs> child -> ids it references
+    refs: dict[ET.Element, set[str]]
+    # top-level <defs> children without ids (e.g. <style>); every card keeps them
+    shared: list[ET.Element]
+
+
+def referenced_ids(element: ET.Element) -> set[str]:
+    """Collects the ids an element subtree points at via href="#id" or url(#id)."""
+    refs: set[str] = set()
+    for el in element.iter():
+        for key, value in el.attrib.items():
+            if key.endswith("href") and value.startswith("#"):
+                refs.add(value[1:])
+            elif "url(" in value:
+                refs.update(URL_REF_RE.findall(value))
+        if el.text and "url(" in el.text:
+            refs.update(URL_REF_RE.findall(el.text))
+    return refs
+
+
+def index_defs(defs: ET.Element) -> DefsIndex:
+    elements: dict[str, ET.Element] = {}
+    owners: dict[str, ET.Element] = {}
+    for child in defs:
+        for el in child.iter():
+            el_id = el.get("id")
+            if el_id:
+                elements.setdefault(el_id, el)
+                owners.setdefault(el_id, child)
+    refs = {child: referenced_ids(child) for child in defs}
+    owned = set(owners.values())
+    shared = [child for child in defs if child not in owned]
+    return DefsIndex(defs, elements, owners, refs, shared)
+
+
+def defs_for(index: DefsIndex, target: ET.Element) -> ET.Element:
     """
-    Creates a new SVG containing ONLY the global defs/styles and the target card.
+    Builds a <defs> holding only what the target needs: entries it references
+    (transitively) plus id-less entries such as <style>, in source order.
+    Without this every card would carry the whole deck's definitions.
     """
-    svg_ns = "http://www.w3.org/2000/svg"
-    defs = original_root.find(f"{{{svg_ns}}}defs")
-    if defs is None:
-        print("  [ERROR] No <defs> section found in SVG.")
+    kept = set(index.shared)
+    pending = list(referenced_ids(target))
+    for child in index.shared:
+        pending.extend(index.refs[child])
+    seen: set[str] = set()
+    while pending:
+        ref = pending.pop()
+        if ref in seen:
+            continue
+        seen.add(ref)
+        owner = index.owners.get(ref)
+        if owner is not None and owner not in kept:
+            kept.add(owner)
+            pending.extend(index.refs[owner])
+
+    # Entries are shared with the source tree, not copied: ElementTree elements
+    # keep no parent link and nothing here mutates them.
+    defs = ET.Element(index.defs.tag, index.defs.attrib)
+    defs.extend(child for child in index.defs if child in kept)
+    return defs
+
+
+def save_isolated_card(original_root: ET.Element, index: DefsIndex, filename: str, target_id: str) -> None:
+    """
+    Creates a new SVG containing ONLY the target card and the defs/styles it uses.
+    """
+    target = index.elements.get(target_id)
+    if target is None:
+        print(f"  [ERROR] ID '{target_id}' not found in SVG.")
         return
 
-    defs_copy = copy.deepcopy(defs)
-    target_copy = None
-
-    # Locate the target anywhere inside defs (cards live there in this source SVG)
-    for child in defs_copy.iter():
-        if child.attrib.get("id") == target_id:
-            target_copy = copy.deepcopy(child)
-            target_copy.attrib.pop("display", None)
-            break
+    # Clone only the card element itself, minus display="none"; its children are
+    # shared read-only with the source tree, like the defs entries.
+    card = ET.Element(target.tag, {k: v for k, v in target.attrib.items() if k != "display"})
+    card.text, card.tail = target.text, target.tail
+    card.extend(target)
 
     # Build a new root with the same attributes (width, height, viewBox, etc.)
     new_root = ET.Element(original_root.tag, original_root.attrib)
-    new_root.append(defs_copy)
-    found_target = False
-
-    if target_copy is not None:
-        # Place the card outside <defs> so it renders directly.
-        new_root.append(target_copy)
-        found_target = True
-
-    if found_target:
-        out_path = OUTPUT_DIR / filename
-        new_tree = ET.ElementTree(new_root)
-        new_tree.write(out_path, encoding="utf-8", xml_declaration=True)
-        print(f"  Saved {filename}")
-    else:
-        print(f"  [ERROR] ID '{target_id}' not found in SVG.")
+    new_root.append(defs_for(index, target))
+    # Place the card outside <defs> so it renders directly.
+    new_root.append(card)
+
+    out_path = OUTPUT_DIR / filename
+    out_path.write_bytes(ET.tostring(new_root, encoding="utf-8", xml_declaration=True))
+    print(f"  Saved {filename}")
 
 
 if __name__ == "__main__":
@@ -1,11 +1,18 @@
 import os
-import urllib.request
-import xml.etree.ElementTree as ET
-import copy
+import hashlib
 import re
+import ssl
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from urllib.error import HTTPError
+from urllib.request import HTTPSHandler, Request, build_opener
 
 # --- Configuration ---
 OUTPUT_DIR = "digitaldesignlabs"
+# Downloaded sources, keyed by URL hash; re-runs only revalidate them. Anchored
+# next to this script: OUTPUT_DIR (and the working directory) is a served asset folder.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "wikimedia")
 
 # DigitalDesignLabs Dimensions (must match exact card dimensions)
 TARGET_WIDTH = 225
@@ -13,6 +20,15 @@ TARGET_HEIGHT = 314
 BORDER_RADIUS = 11.25
 STROKE_WIDTH = 2
 JOKER_VERTICAL_PADDING = 16.0  # px, applied to downloaded (XL) jokers only
+MAX_WORKERS = 8  # concurrent downloads
+
+# DDL conventions: 1B.svg is the card back; 1J.svg and 2J.svg are jokers.
+BACK = "B"
+JOKER = "J"
+CARD_KINDS = {"B.SVG": BACK, "J.SVG": JOKER}
+
+VIEWBOX_SPLIT_RE = re.compile(r"[,\s]+")
+UNIT_STRIP_RE = re.compile(r"[^\d.]")
 
 # Namespaces
 NS_SVG = "http://www.w3.org/2000/svg"
@@ -22,11 +38,12 @@ NS_XLINK = "http://www.w3.org/1999/xlink"
 ET.register_namespace("", NS_SVG)
 ET.register_namespace("xlink", NS_XLINK)
 
-def svg_tag(local_name):
-    return f"{{{NS_SVG}}}{local_name}"
-
-def svg_el(local_name, attrib=None):
-    return ET.Element(svg_tag(local_name), attrib or {})
+# Qualified tag names as ElementTree reports them
+SVG_TAG = f"{{{NS_SVG}}}svg"
+DEFS_TAG = f"{{{NS_SVG}}}defs"
+CLIP_PATH_TAG = f"{{{NS_SVG}}}clipPath"
+G_TAG = f"{{{NS_SVG}}}g"
+RECT_TAG = f"{{{NS_SVG}}}rect"
 
 # --- Source Definitions ---
 URLS = {
@@ -45,24 +62,58 @@ URLS = {
 # Apply XL assets to root folder as well
 # (disabled) we only emit files under sm/ and xl/
 
+# One TLS context and opener shared by every download, so the CA bundle is
+# loaded once rather than per request
+SSL_CONTEXT = ssl.create_default_context()
+OPENER = build_opener(HTTPSHandler(context=SSL_CONTEXT))
+
 def safe_urlopen(url_or_req):
-    url = url_or_req.get_full_url() if isinstance(url_or_req, urllib.request.Request) else url_or_req
-    parsed = urllib.parse.urlparse(url)
-    if parsed.scheme not in ('http', 'https'):
-        raise ValueError(f"Insecure URL scheme: {parsed.scheme}")
+    url = url_or_req.get_full_url() if isinstance(url_or_req, Request) else url_or_req
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError(f"Insecure URL scheme: {url.split(':', 1)[0]}")
     # nosemgrep: python.lang.security.audit.dynamic-urllib-use-detected.dynamic-urllib-use-detected
-    return urllib.request.urlopen(url_or_req)
+    return OPENER.open(url_or_req)
+
+def cache_path_for(url):
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, f"{digest}.svg")
 
 def download_svg_content(url):
-    """Downloads content with a proper User-Agent."""
+    """
+    Downloads content with a proper User-Agent, through the local cache.
+    A cached copy turns the request into a conditional one, so an unchanged
+    source costs a 304 instead of a full download, and is used as-is when the
+    download fails.
+    """
+    cache_path = cache_path_for(url)
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    try:
+        headers['If-Modified-Since'] = formatdate(os.path.getmtime(cache_path), usegmt=True)
+    except OSError:
+        pass
+
     try:
         print(f"Downloading {url}...")
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+        req = Request(url, headers=headers)
         with safe_urlopen(req) as response:
-            return response.read().decode('utf-8')
+            data = response.read()
     except Exception as e:
-        print(f"Error downloading {url}: {e}")
-        return None
+        cached = 'If-Modified-Since' in headers
+        if isinstance(e, HTTPError) and e.code == 304 and cached:
+            pass
+        elif cached:
+            print(f"Error downloading {url}: {e} (using cached copy)")
+        else:
+            print(f"Error downloading {url}: {e}")
+            return None
+        with open(cache_path, 'rb') as f:
+            return f.read()
+
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, cache_path)
+    return data
 
 def get_viewbox(root):
     """
@@ -71,7 +122,9 @@ def get_viewbox(root):
     """
     vb = root.get("viewBox")
     if vb:
-        parts = re.split(r"[,\s]+", vb.strip())
+        # Almost always four space-separated numbers; any comma (alone or mixed
+        # with spaces) goes through the regex.
+        parts = vb.split() if ',' not in vb else VIEWBOX_SPLIT_RE.split(vb.strip())
         if len(parts) == 4:
             return float(parts[0]), float(parts[1]), float(parts[2]), float(parts[3])
 
@@ -81,7 +134,7 @@ def get_viewbox(root):
     def parse_unit(val):
         if not val:
             return 0.0
-        clean = re.sub(r"[^\d.]", "", val)
+        clean = UNIT_STRIP_RE.sub("", val)
         try:
             return float(clean)
         except Exception:
@@ -99,7 +152,7 @@ def create_container_svg():
     Creates the standard DDL card container.
     IMPORTANT: Do NOT manually add xmlns attributes here; register_namespace handles it.
     """
-    return svg_el('svg', {
+    return ET.Element(SVG_TAG, {
         'width': str(TARGET_WIDTH),
         'height': str(TARGET_HEIGHT),
         'viewBox': f"0 0 {TARGET_WIDTH} {TARGET_HEIGHT}"
@@ -110,80 +163,58 @@ def inner_rect():
     inset = STROKE_WIDTH / 2
     return inset, inset, TARGET_WIDTH - STROKE_WIDTH, TARGET_HEIGHT - STROKE_WIDTH
 
-def ensure_defs(root):
-    """Ensures a <defs> exists and returns it."""
-    for child in root:
-        if child.tag.endswith("defs"):
-            return child
-    defs = svg_el("defs")
-    root.insert(0, defs)
-    return defs
+INNER_RECT = inner_rect()
+
+# Rounded interior rect shared by the background and the clipPath
+INNER_RECT_ATTRIBS = {
+    "x": str(INNER_RECT[0]),
+    "y": str(INNER_RECT[1]),
+    "width": str(INNER_RECT[2]),
+    "height": str(INNER_RECT[3]),
+    "rx": str(BORDER_RADIUS),
+    "ry": str(BORDER_RADIUS),
+}
+INNER_RECT_MARKUP = " ".join(f'{name}="{value}"' for name, value in INNER_RECT_ATTRIBS.items())
+
+# Standard border rect (must match exact DDL dimensions)
+BORDER_ATTRIBS = {
+    'x': "1.0",
+    'y': "1.0",
+    'width': "223.0",
+    'height': "312.0",
+    'rx': "11.25",
+    'ry': "11.25",
+    'fill': 'none',
+    'stroke': 'black',
+    'stroke-width': "2"
+}
 
 def add_background(root, fill="#fefefe"):
-    """Adds the standard rounded background fill (prevents corner bleed)."""
-    x, y, w, h = inner_rect()
-    bg = svg_el("rect", {
-        "x": str(x),
-        "y": str(y),
-        "width": str(w),
-        "height": str(h),
-        "rx": str(BORDER_RADIUS),
-        "ry": str(BORDER_RADIUS),
-        "fill": fill,
-    })
-    root.insert(0, bg)
-
-def add_clip_path(root, clip_id="card-clip"):
-    """Adds a rounded-rect clipPath for the card interior and returns clip_id."""
-    defs = ensure_defs(root)
-    # Avoid duplicates if called multiple times
-    for cp in defs:
-        if cp.tag.endswith("clipPath") and cp.get("id") == clip_id:
-            return clip_id
-
-    x, y, w, h = inner_rect()
-    cp = ET.SubElement(defs, svg_tag("clipPath"), {"id": clip_id})
-    ET.SubElement(cp, svg_tag("rect"), {
-        "x": str(x),
-        "y": str(y),
-        "width": str(w),
-        "height": str(h),
-        "rx": str(BORDER_RADIUS),
-        "ry": str(BORDER_RADIUS),
-    })
+    """Appends the standard rounded background fill (prevents corner bleed)."""
+    ET.SubElement(root, RECT_TAG, {**INNER_RECT_ATTRIBS, "fill": fill})
+
+def add_clip_path(defs, clip_id="card-clip"):
+    """Adds a rounded-rect clipPath for the card interior to defs and returns clip_id."""
+    cp = ET.SubElement(defs, CLIP_PATH_TAG, {"id": clip_id})
+    ET.SubElement(cp, RECT_TAG, INNER_RECT_ATTRIBS)
     return clip_id
 
 def add_border(root):
-    """Adds the standard border rect (must match exact DDL dimensions)."""
-    rect = svg_el('rect', {
-        'x': "1.0",
-        'y': "1.0",
-        'width': "223.0",
-        'height': "312.0",
-        'rx': "11.25",
-        'ry': "11.25",
-        'fill': 'none',
-        'stroke': 'black',
-        'stroke-width': "2"
-    })
-    root.append(rect)
-
-def is_back_filename(filename):
-    # DDL conventions: 1B.svg is the card back.
-    return filename.upper().endswith("B.SVG")
+    """Adds the standard border rect."""
+    ET.SubElement(root, RECT_TAG, BORDER_ATTRIBS)
 
-def is_joker_filename(filename):
-    # DDL conventions: 1J.svg and 2J.svg are jokers.
-    return filename.upper().endswith("J.SVG")
+def classify(filename):
+    """Returns BACK, JOKER or None for a DDL target filename."""
+    return CARD_KINDS.get(filename[-5:].upper())
 
-def process_downloaded_svg(content, filename, target_dir, mode="contain"):
+def process_downloaded_svg(content, filename, target_dir, kind, mode="contain"):
     """Wraps downloaded SVG content to fit the DDL card interior and clips corners."""
     try:
-        # Strip XML declaration
-        if content.strip().startswith('<?xml'):
-            content = content.split('?>', 1)[1]
-            
-        src_root = ET.fromstring(content)
+        # Feed the raw bytes straight to the C parser: expat consumes the XML
+        # declaration and decodes per its encoding, so no str copy is made.
+        parser = ET.XMLParser(target=ET.TreeBuilder())
+        parser.feed(content)
+        src_root = parser.close()
     except ET.ParseError as e:
         print(f"XML Error in {filename}: {e}")
         return
@@ -191,8 +222,8 @@ def process_downloaded_svg(content, filename, target_dir, mode="contain"):
     src_min_x, src_min_y, src_w, src_h = get_viewbox(src_root)
 
     # Scale to the DDL interior rect (inside the border stroke).
-    dst_x, dst_y, dst_w, dst_h = inner_rect()
-    if is_joker_filename(filename):
+    dst_x, dst_y, dst_w, dst_h = INNER_RECT
+    if kind == JOKER:
         # Add some breathing room top/bottom (like the DDL feel), while we still
         # crop away the source SVG's own border via mode/overscale.
         dst_y += JOKER_VERTICAL_PADDING
@@ -210,12 +241,12 @@ def process_downloaded_svg(content, filename, target_dir, mode="contain"):
 
     # The Wikimedia back/joker SVGs include their own card framing/border.
     # We overscale slightly and rely on rounded clipping to crop it away.
-    if is_back_filename(filename):
+    if kind == BACK:
         # The remaining artifact is mostly on the left/right; overscale a bit more
         # in X than Y so we crop that away without shrinking the top/bottom margin.
         scale_x *= 1.035
         scale_y *= 1.02
-    elif is_joker_filename(filename):
+    elif kind == JOKER:
         scale_x *= 1.01
         scale_y *= 1.01
 
@@ -229,11 +260,14 @@ def process_downloaded_svg(content, filename, target_dir, mode="contain"):
      
     new_root = create_container_svg()
 
+    # The container starts empty, so its <defs> is created here and handed to
+    # the helpers rather than searched for.
+    defs = ET.SubElement(new_root, DEFS_TAG)
     add_background(new_root)
-    clip_id = add_clip_path(new_root)
+    clip_id = add_clip_path(defs)
 
-    clipped = svg_el("g", {"clip-path": f"url(#{clip_id})"})
-    wrapper = svg_el("g", {"transform": transform})
+    clipped = ET.Element(G_TAG, {"clip-path": f"url(#{clip_id})"})
+    wrapper = ET.Element(G_TAG, {"transform": transform})
 
     # Move children. 
     # NOTE: We do not strip namespaces from children; ET handles that via register_namespace.
@@ -244,21 +278,39 @@ def process_downloaded_svg(content, filename, target_dir, mode="contain"):
     new_root.append(clipped)
     add_border(new_root)
 
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
-    
     out_path = os.path.join(target_dir, filename)
-    ET.ElementTree(new_root).write(out_path, encoding='utf-8', xml_declaration=False)
+    # Serialize to one buffer and write it in a single call
+    data = ET.tostring(new_root, encoding='utf-8', xml_declaration=False)
+    with open(out_path, 'wb') as f:
+        f.write(data)
     print(f" -> Saved {out_path}")
 
+# Generated SM jokers are a fixed shape, so they are emitted from a string
+# template instead of being built (and serialized) through ElementTree.
+SIMPLE_JOKER_TEMPLATE = (
+    '<svg xmlns="{ns}" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+    '<defs><clipPath id="{clip_id}"><rect {rect} /></clipPath></defs>'
+    '<rect {rect} fill="#fefefe" />'
+    '<g clip-path="url(#{clip_id})">'
+    '<g transform="translate({cx} 0) scale({x_scale} 1) translate({neg_cx} 0)">{letters}</g>'
+    '</g>'
+    '<rect x="1.0" y="1.0" width="223.0" height="312.0" rx="11.25" ry="11.25" '
+    'fill="none" stroke="black" stroke-width="2" />'
+    '</svg>'
+)
+
+# Use stroke-based emboldening for consistent "heavier" rendering across
+# environments (font-weight is not reliably honored for system fonts).
+# Formatted in two passes: once per joker for the shared attributes, leaving
+# {y} and {char} for each letter.
+SIMPLE_JOKER_LETTER_TEMPLATE = (
+    '<text x="{x}" y="{{y}}" font-family="Times New Roman, serif" font-weight="bold" '
+    'font-size="{font_size}" fill="{fill}" stroke="{fill}" stroke-width="1.2" '
+    'paint-order="stroke fill" text-anchor="middle" dominant-baseline="middle">{{char}}</text>'
+)
+
 def generate_simple_joker(color, filename, target_dir):
     """Generates a text-based Joker with correct centering and font."""
-    root = create_container_svg()
-    
-    add_background(root)
-    clip_id = add_clip_path(root)
-    clipped = svg_el("g", {"clip-path": f"url(#{clip_id})"})
-    
     fill = "#d40000" if color == "red" else "#000000"
     
     letters = ["J", "O", "K", "E", "R"]
@@ -271,67 +323,67 @@ def generate_simple_joker(color, filename, target_dir):
     y_offset = 6.0
 
     # Vertical centering: each letter is anchored at its visual middle.
-    _, inner_y, _, inner_h = inner_rect()
+    _, inner_y, _, inner_h = INNER_RECT
     center_y = inner_y + (inner_h / 2)
     start_y = center_y - ((len(letters) - 1) * letter_spacing / 2) + y_offset
 
+    ys = [start_y + (i * letter_spacing) for i in range(len(letters))]
+
     # Widen the typography a bit around the card centerline.
     cx = TARGET_WIDTH / 2
-    stretched = svg_el("g", {
-        "transform": f"translate({cx} 0) scale({x_scale} 1) translate({-cx} 0)"
-    })
-    
-    for i, char in enumerate(letters):
-        text = svg_el('text', {
-            'x': str(TARGET_WIDTH / 2),
-            'y': str(start_y + (i * letter_spacing)),
-            'font-family': 'Times New Roman, serif', # Better looking font
-            # Use stroke-based emboldening for consistent "heavier" rendering across
-            # environments (font-weight is not reliably honored for system fonts).
-            'font-weight': 'bold',
-            'font-size': str(font_size),
-            'fill': fill,
-            'stroke': fill,
-            'stroke-width': "1.2",
-            'paint-order': "stroke fill",
-            'text-anchor': 'middle',
-            'dominant-baseline': 'middle'
-        })
-        text.text = char
-        stretched.append(text)
-
-    clipped.append(stretched)
-    root.append(clipped)
-
-    add_border(root)
+    letter_template = SIMPLE_JOKER_LETTER_TEMPLATE.format(x=cx, font_size=font_size, fill=fill)
+
+    svg = SIMPLE_JOKER_TEMPLATE.format(
+        ns=NS_SVG,
+        width=TARGET_WIDTH,
+        height=TARGET_HEIGHT,
+        clip_id="card-clip",
+        rect=INNER_RECT_MARKUP,
+        cx=cx,
+        neg_cx=-cx,
+        x_scale=x_scale,
+        letters="".join(letter_template.format(y=y, char=char) for y, char in zip(ys, letters)),
+    )
     
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
-        
     out_path = os.path.join(target_dir, filename)
-    ET.ElementTree(root).write(out_path, encoding='utf-8', xml_declaration=False)
+    with open(out_path, 'wb') as f:
+        f.write(svg.encode('utf-8'))
     print(f" -> Generated {out_path}")
 
 def main():
     print("Processing DigitalDesignLabs Extras...")
 
+    # Create every directory written below up front, once
+    sm_dir = os.path.join(OUTPUT_DIR, "sm")
+    for directory in [CACHE_DIR, sm_dir, *(os.path.join(OUTPUT_DIR, key) for key in URLS)]:
+        os.makedirs(directory, exist_ok=True)
+
     # 1. Process Downloads (XL, Root, SM Backs)
-    for folder_key, file_map in URLS.items():
+    # Fetch each distinct URL once, concurrently (the requests are pure network
+    # wait), then process the results serially in the original order.
+    downloads = [
+        (folder_key, filename, url)
+        for folder_key, file_map in URLS.items()
+        for filename, url in file_map.items()
+    ]
+    unique_urls = list(dict.fromkeys(url for _, _, url in downloads))
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        contents = dict(zip(unique_urls, executor.map(download_svg_content, unique_urls)))
+
+    for folder_key, filename, url in downloads:
         target_dir = os.path.join(OUTPUT_DIR, folder_key)
-        
-        for filename, url in file_map.items():
-            content = download_svg_content(url)
-            if content:
-                # These Wikimedia sources are already "a whole card"; fit them into the
-                # DDL card interior (no extra padding), and rely on rounded clipping.
-                #
-                # For jokers, crop away the Wikimedia card border.
-                # For backs, keep the intended white margin framing.
-                mode = "cover" if is_joker_filename(filename) else "contain"
-                process_downloaded_svg(content, filename, target_dir, mode)
+        content = contents[url]
+        if content:
+            # These Wikimedia sources are already "a whole card"; fit them into the
+            # DDL card interior (no extra padding), and rely on rounded clipping.
+            #
+            # For jokers, crop away the Wikimedia card border.
+            # For backs, keep the intended white margin framing.
+            kind = classify(filename)
+            mode = "cover" if kind == JOKER else "contain"
+            process_downloaded_svg(content, filename, target_dir, kind, mode)
 
     # 2. Generate SM Jokers
-    sm_dir = os.path.join(OUTPUT_DIR, "sm")
     generate_simple_joker("red", "1J.svg", sm_dir)
     generate_simple_joker("black", "2J.svg", sm_dir)
 
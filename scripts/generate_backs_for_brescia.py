@@ -8,8 +8,22 @@ MARGIN = 10         # Distance between edge and the pattern
 PAPER_COLOR = "#f2f2f2" # Light greyish tone seen in your screenshot
 STROKE_COLOR = "#000000"
 
-def generate_back(filename, color_primary, color_secondary):
-    svg_content = f"""<svg width="{WIDTH}" height="{HEIGHT}" viewBox="0 0 {WIDTH} {HEIGHT}" xmlns="http://www.w3.org/2000/svg">
+# Derived dimensions, computed once and substituted into BACK_TEMPLATE
+DIMS = {
+    "WIDTH": WIDTH,
+    "HEIGHT": HEIGHT,
+    "CORNER_RADIUS": CORNER_RADIUS,
+    "MARGIN": MARGIN,
+    "PAPER_COLOR": PAPER_COLOR,
+    "STROKE_COLOR": STROKE_COLOR,
+    "OUTER_WIDTH": WIDTH - 1,
+    "OUTER_HEIGHT": HEIGHT - 1,
+    "INNER_WIDTH": WIDTH - (MARGIN * 2),
+    "INNER_HEIGHT": HEIGHT - (MARGIN * 2),
+    "INNER_RADIUS": CORNER_RADIUS / 2,
+}
+
+BACK_TEMPLATE = """<svg width="{WIDTH}" height="{HEIGHT}" viewBox="0 0 {WIDTH} {HEIGHT}" xmlns="http://www.w3.org/2000/svg">
       <defs>
         <!-- Geometric Pattern (Tarocchi Style) -->
         <pattern id="BackPattern" x="0" y="0" width="16" height="16" patternUnits="userSpaceOnUse">
@@ -23,15 +37,20 @@ def generate_back(filename, color_primary, color_secondary):
 
       <!-- 1. Card Base (Paper) -->
       <!-- Adjusted to 159x319 to match the 2C.svg aspect ratio -->
-      <rect x="0.5" y="0.5" width="{WIDTH-1}" height="{HEIGHT-1}" rx="{CORNER_RADIUS}" ry="{CORNER_RADIUS}" 
+      <rect x="0.5" y="0.5" width="{OUTER_WIDTH}" height="{OUTER_HEIGHT}" rx="{CORNER_RADIUS}" ry="{CORNER_RADIUS}" 
             fill="{PAPER_COLOR}" stroke="{STROKE_COLOR}" stroke-width="1" />
 
       <!-- 2. Inner Frame (Pattern Area) -->
       <!-- Defines the white/grey margin between the edge and the pattern -->
-      <rect x="{MARGIN}" y="{MARGIN}" width="{WIDTH - (MARGIN*2)}" height="{HEIGHT - (MARGIN*2)}" rx="{CORNER_RADIUS/2}" ry="{CORNER_RADIUS/2}" 
+      <rect x="{MARGIN}" y="{MARGIN}" width="{INNER_WIDTH}" height="{INNER_HEIGHT}" rx="{INNER_RADIUS}" ry="{INNER_RADIUS}" 
             fill="url(#BackPattern)" stroke="{STROKE_COLOR}" stroke-width="1" />
     </svg>
     """
+
+def generate_back(filename, color_primary, color_secondary):
+    svg_content = BACK_TEMPLATE.format_map(
+        DIMS | {"color_primary": color_primary, "color_secondary": color_secondary}
+    )
     
     with open(filename, "w") as f:
         f.write(svg_content)
@@ -8,41 +8,60 @@ MARGIN = 10
 PAPER_COLOR = "#f2f2f2"
 STROKE_COLOR = "#000000"
 
-def create_better_joker(filename, main_color):
-    # FIXED: Clean string with NO comments inside
-    # This draws the 3-pointed floppy Jester hat
-    hat_path = (
-        "M 50 130 "
-        "C 20 130, 10 90, 25 80 "
-        "C 40 95, 55 115, 65 115 "
-        "C 70 80, 75 50, 80 50 "
-        "C 85 50, 90 80, 95 115 "
-        "C 105 115, 120 95, 135 80 "
-        "C 150 90, 140 130, 110 130 "
-        "Q 80 145, 50 130 Z"
-    )
+# FIXED: Clean string with NO comments inside
+# This draws the 3-pointed floppy Jester hat
+HAT_PATH = (
+    "M 50 130 "
+    "C 20 130, 10 90, 25 80 "
+    "C 40 95, 55 115, 65 115 "
+    "C 70 80, 75 50, 80 50 "
+    "C 85 50, 90 80, 95 115 "
+    "C 105 115, 120 95, 135 80 "
+    "C 150 90, 140 130, 110 130 "
+    "Q 80 145, 50 130 Z"
+)
+
+# 5-pointed Star Points
+STAR_POINTS = "80,240 84,252 96,252 86,260 90,272 80,264 70,272 74,260 64,252 76,252"
 
-    # 5-pointed Star Points
-    star_points = "80,240 84,252 96,252 86,260 90,272 80,264 70,272 74,260 64,252 76,252"
+# Derived dimensions, computed once and substituted into JOKER_TEMPLATE
+DIMS = {
+    "WIDTH": WIDTH,
+    "HEIGHT": HEIGHT,
+    "CORNER_RADIUS": CORNER_RADIUS,
+    "MARGIN": MARGIN,
+    "PAPER_COLOR": PAPER_COLOR,
+    "STROKE_COLOR": STROKE_COLOR,
+    "OUTER_WIDTH": WIDTH - 1,
+    "OUTER_HEIGHT": HEIGHT - 1,
+    "INNER_WIDTH": WIDTH - (MARGIN * 2),
+    "INNER_HEIGHT": HEIGHT - (MARGIN * 2),
+    "INNER_RADIUS": CORNER_RADIUS / 2,
+    "INDEX_X": WIDTH - 22,
+    "INDEX_Y": HEIGHT - 35,
+    "CENTER_X": WIDTH / 2,
+    "HAT_PATH": HAT_PATH,
+    "STAR_POINTS": STAR_POINTS,
+}
 
-    svg_content = f"""<svg width="{WIDTH}" height="{HEIGHT}" viewBox="0 0 {WIDTH} {HEIGHT}" xmlns="http://www.w3.org/2000/svg">
+JOKER_TEMPLATE = """<svg width="{WIDTH}" height="{HEIGHT}" viewBox="0 0 {WIDTH} {HEIGHT}" xmlns="http://www.w3.org/2000/svg">
       <!-- 1. Card Base -->
-      <rect x="0.5" y="0.5" width="{WIDTH-1}" height="{HEIGHT-1}" rx="{CORNER_RADIUS}" ry="{CORNER_RADIUS}" 
+      <rect x="0.5" y="0.5" width="{OUTER_WIDTH}" height="{OUTER_HEIGHT}" rx="{CORNER_RADIUS}" ry="{CORNER_RADIUS}" 
             fill="{PAPER_COLOR}" stroke="{STROKE_COLOR}" stroke-width="1" />
 
       <!-- 2. Inner Frame -->
-      <rect x="{MARGIN}" y="{MARGIN}" width="{WIDTH - (MARGIN*2)}" height="{HEIGHT - (MARGIN*2)}" rx="{CORNER_RADIUS/2}" ry="{CORNER_RADIUS/2}" 
+      <rect x="{MARGIN}" y="{MARGIN}" width="{INNER_WIDTH}" height="{INNER_HEIGHT}" rx="{INNER_RADIUS}" ry="{INNER_RADIUS}" 
             fill="none" stroke="{STROKE_COLOR}" stroke-width="1" />
 
       <!-- 3. Corner Indices (J) -->
       <text x="22" y="35" font-family="Times New Roman, serif" font-size="22" font-weight="bold" fill="{main_color}" text-anchor="middle">J</text>
-      <text x="{WIDTH-22}" y="{HEIGHT-35}" font-family="Times New Roman, serif" font-size="22" font-weight="bold" fill="{main_color}" text-anchor="middle" transform="rotate(180, {WIDTH-22}, {HEIGHT-35})">J</text>
+      <text x="{INDEX_X}" y="{INDEX_Y}" font-family="Times New Roman, serif" font-size="22" font-weight="bold" fill="{main_color}" text-anchor="middle" transform="rotate(180, {INDEX_X}, {INDEX_Y})">J</text>
 
       <!-- 4. Central Art -->
       <g transform="translate(0, 10)">
           
           <!-- The Hat Shape -->
-          <path d="{hat_path}" fill="{main_color}" stroke="black" stroke-width="1.5" />
+          <path d="{HAT_PATH}" fill="{main_color}" stroke="black" stroke-width="1.5" />
           
           <!-- The Bells (Gold circles at the tips of the tails) -->
           <circle cx="25" cy="80" r="6" fill="#FFD700" stroke="black" stroke-width="1"/>
@@ -53,14 +72,17 @@ def create_better_joker(filename, main_color):
           <path d="M 55 155 Q 80 175 105 155" fill="none" stroke="black" stroke-width="2" stroke-linecap="round"/>
 
           <!-- The Text "JOLLY" -->
-          <text x="{WIDTH/2}" y="210" font-family="Times New Roman, serif" font-size="26" font-weight="bold" 
+          <text x="{CENTER_X}" y="210" font-family="Times New Roman, serif" font-size="26" font-weight="bold" 
                 fill="{main_color}" text-anchor="middle" letter-spacing="1">JOLLY</text>
                 
           <!-- Decorative Star (Neutral Symbol) -->
-          <polygon points="{star_points}" fill="{main_color}" transform="translate(0, -5)"/>
+          <polygon points="{STAR_POINTS}" fill="{main_color}" transform="translate(0, -5)"/>
       </g>
     </svg>
     """
+
+def create_better_joker(filename, main_color):
+    svg_content = JOKER_TEMPLATE.format_map(DIMS | {"main_color": main_color})
     
     with open(filename, "w") as f:
         f.write(svg_content)
@@ -3,7 +3,10 @@ import os
 import sys
 import subprocess
 import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from xml.parsers import expat
 
 def run_command(cmd_list, file_path, verbose=False):
     try:
@@ -20,6 +23,36 @@ def run_command(cmd_list, file_path, verbose=False):
     except Exception:
         return False
 
+def xml_error(svg_file):
+    """
+    Checks that an SVG is well-formed, namespaces included (what `xmllint --noout`
+    checked), and returns the parser error or None.
+    """
+    parser = expat.ParserCreate(namespace_separator="}")
+    try:
+        with open(svg_file, "rb") as f:
+            parser.ParseFile(f)
+    except (expat.ExpatError, OSError) as e:
+        return str(e)
+    return None
+
+def check_xml(svg_file):
+    return svg_file, xml_error(svg_file)
+
+def iter_svg_files(directory):
+    """
+    Yields the SVG files under directory (not following directory symlinks, like
+    Path.rglob), using scandir's entry types instead of a stat call per entry.
+    """
+    pending = [directory]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.name.endswith(".svg"):
+                    yield Path(entry.path)
+
 parser = argparse.ArgumentParser(description="Validate SVGs recursively.")
 parser.add_argument("directory", help="Directory to search for SVGs")
 parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
@@ -38,34 +71,39 @@ print(f"Validating SVGs recursively in: {directory}")
 failed = False
 
 # Find all SVG files recursively
-svg_files = list(directory.rglob("*.svg"))
+svg_files = iter_svg_files(directory)
+first_svg = next(svg_files, None)
 
-if not svg_files:
+if first_svg is None:
     print("No SVG files found.")
     sys.exit(0)
 
-for svg_file in svg_files:
-    print(f"=== Checking {svg_file} ===")
+# XML well-formedness, checked in-process instead of spawning xmllint per file.
+# Paths stream from the walk into the pool, so checking starts before the walk ends.
+with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+    for svg_file, error in executor.map(check_xml, itertools.chain([first_svg], svg_files)):
+        print(f"=== Checking {svg_file} ===")
     
-    # xmllint validation
-    xmllint_pass = run_command(["xmllint", "--noout", str(svg_file)], svg_file, verbose=verbose)
-    print(f"  {'✓' if xmllint_pass else '✗'} xmllint: {'PASS' if xmllint_pass else 'FAIL'}")
-    if not xmllint_pass:
-        failed = True
+        xml_pass = error is None
+        if verbose and error:
+            print(f"{svg_file}: {error}", file=sys.stderr)
+        print(f"  {'✓' if xml_pass else '✗'} xml: {'PASS' if xml_pass else 'FAIL'}")
+        if not xml_pass:
+            failed = True
     
-    if use_svgcheck:
-        # svgcheck validation
-        svgcheck_cmd = ["svgcheck"]
-        if not verbose:
-            svgcheck_cmd.append("--quiet")
-        svgcheck_cmd.append(str(svg_file))
+        if use_svgcheck:
+            # svgcheck validation
+            svgcheck_cmd = ["svgcheck"]
+            if not verbose:
+                svgcheck_cmd.append("--quiet")
+            svgcheck_cmd.append(str(svg_file))
         
-        svgcheck_pass = run_command(svgcheck_cmd, svg_file, verbose=verbose)
-        print(f"  {'✓' if svgcheck_pass else '✗'} svgcheck: {'PASS' if svgcheck_pass else 'FAIL'}")
-        if not svgcheck_pass:
-            failed = True
+            svgcheck_pass = run_command(svgcheck_cmd, svg_file, verbose=verbose)
+            print(f"  {'✓' if svgcheck_pass else '✗'} svgcheck: {'PASS' if svgcheck_pass else 'FAIL'}")
+            if not svgcheck_pass:
+                failed = True
     
-    print()
+        print()
 
 if not failed:
     print("All SVGs passed validation!")